@@ -1,9 +1,12 @@
-from skyfield.api import load, EarthSatellite, Topos, wgs84
-from skyfield.framelib import itrs
+from skyfield.api import load, EarthSatellite, wgs84
 from skyfield.nutationlib import iau2000b
+from skyfield.sgp4lib import theta_GMST1982
+from skyfield.functions import rot_z
+from sgp4.api import SatrecArray
+from pymap3d.ecef import ecef2geodetic
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 
 # ======================== 全局配置（需与S2协商确认）========================
@@ -39,7 +42,47 @@ def init_time_scale():
     )
     return ts, t0
 
-def load_and_filter_satellites(t0, observer):
+def init_observer():
+    """
+    初始化救援中心观察点：返回其ECEF坐标（km）和当地天顶单位向量（大地法线）
+    只在启动时计算一次，筛选时直接复用
+    """
+    observer = wgs84.latlon(OBS_LAT, OBS_LON, elevation_m=OBS_ELE)
+    obs_ecef_km = observer.itrs_xyz.km
+    lat, lon = observer.latitude.radians, observer.longitude.radians
+    obs_up = np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+    return obs_ecef_km, obs_up
+
+def sgp4_epoch(t):
+    """
+    将Skyfield时间对象转换为SGP4所需的UTC儒略日（整数部分, 小数部分）
+    与Skyfield EarthSatellite内部的换算方式一致，保证传播与坐标旋转使用同一时间基准
+    """
+    return t.whole, t.tai_fraction - t._leap_seconds() / 86400.0
+
+def propagate_teme(sat_models, jd, fr):
+    """
+    批量SGP4传播：在(卫星 × 时间)网格上一次性计算TEME坐标
+    返回r/v，形状为(n_sat, n_time, 3)，单位km、km/s
+    """
+    sat_array = SatrecArray(sat_models)
+    errors, r_teme, v_teme = sat_array.sgp4(np.atleast_1d(jd), np.atleast_1d(fr))
+    if errors.any():
+        print(f"⚠️  SGP4传播存在 {np.count_nonzero(errors)} 个错误点")
+    return r_teme, v_teme
+
+def teme_to_ecef(r_teme, t):
+    """
+    TEME → ITRF（ECEF）坐标转换（忽略极移，与TEME_to_ITRF一致）
+    r_teme形状为(n_sat, n_time, 3)，t为对应n_time个时刻的Skyfield时间对象
+    返回ECEF坐标，形状为(3, n_sat, n_time)，单位km
+    """
+    # 同一时刻所有卫星共用一个旋转矩阵：只需构造n_time个3×3矩阵
+    theta, _ = theta_GMST1982(np.atleast_1d(t.whole), np.atleast_1d(t.ut1_fraction))
+    R = rot_z(-theta)  # 形状(3, 3, n_time)
+    return np.einsum("ijt,stj->ist", R, r_teme)
+
+def load_and_filter_satellites(t0, obs_ecef_km, obs_up):
     """
     加载TLE数据并筛选符合条件的卫星
     筛选逻辑：T0时刻仰角>0° 或 距离<2000km，按距离排序取前MAX_SAT_COUNT颗
@@ -49,21 +92,25 @@ def load_and_filter_satellites(t0, observer):
     starlink_sats = [sat for sat in satellites if "STARLINK" in sat.name.upper()]
     print(f"📡 加载到 {len(starlink_sats)} 颗Starlink卫星")
 
-    # 筛选可见卫星
-    visible_sats = []
-    for sat in starlink_sats:
-        diff = sat - observer
-        topo = diff.at(t0)
-        alt_deg = topo.altaz()[0].degrees
-        dist_km = topo.distance().km
-
-        # 满足任一条件即保留
-        if alt_deg > MIN_ALT_DEG or dist_km < MAX_DIST_KM:
-            visible_sats.append((dist_km, sat))
-
-    # 按距离排序，取前N颗
-    visible_sats_sorted = sorted(visible_sats, key=lambda x: x[0])
-    selected_sats = visible_sats_sorted[:MAX_SAT_COUNT]
+    # T0时刻批量传播所有卫星并转换到ECEF（km）
+    r_teme, _ = propagate_teme([sat.model for sat in starlink_sats], *sgp4_epoch(t0))
+    sat_ecef_km = teme_to_ecef(r_teme, t0)[:, :, 0]
+
+    # 筛选可见卫星：向量化计算距离和仰角
+    diff_km = sat_ecef_km - obs_ecef_km[:, np.newaxis]
+    dist_km = np.sqrt(np.einsum("ij,ij->j", diff_km, diff_km))
+    alt_deg = np.degrees(np.arcsin(obs_up @ diff_km / dist_km))
+
+    # 满足任一条件即保留
+    visible_idx = np.flatnonzero((alt_deg > MIN_ALT_DEG) | (dist_km < MAX_DIST_KM))
+
+    # 按距离取前N颗：先argpartition选出最近的N颗（O(N)），再只对这N颗排序
+    visible_dist = dist_km[visible_idx]
+    top = np.arange(len(visible_idx))
+    if len(visible_idx) > MAX_SAT_COUNT:
+        top = np.argpartition(visible_dist, MAX_SAT_COUNT)[:MAX_SAT_COUNT]
+    top = top[np.argsort(visible_dist[top], kind="stable")]
+    selected_sats = [(dist_km[i], starlink_sats[i]) for i in visible_idx[top]]
     print(f"✅ 筛选出 {len(selected_sats)} 颗符合条件的卫星（按距离排序）")
 
     # 生成卫星元数据（ID、IP等）
@@ -85,45 +132,62 @@ def calculate_sat_trajectory(sat_metadata, ts, t0):
     """
     计算卫星轨迹：生成每个时间步的ECEF坐标（米）和高度（千米）
     """
-    all_traces = []
     total_steps = SIM_DURATION_SEC // TIME_STEP_SEC
+    step_sec = np.arange(total_steps) * TIME_STEP_SEC
+
+    # 以T0为基准一次性构造整个时间网格（单个向量化Time对象），SGP4传播和坐标旋转共用
+    t_grid = ts.tt_jd(t0.whole, t0.tt_fraction + step_sec / 86400.0)
 
-    for step in range(total_steps):
-        # 当前时间（秒级）
-        current_sec = step * TIME_STEP_SEC
-        current_time_ms = current_sec * MS_PER_SEC
-        # 转换为Skyfield时间对象
-        current_t = t0 + timedelta(seconds=current_sec)
-
-        # 计算每颗卫星的坐标
-        for sat_info in sat_metadata:
-            sat = sat_info["satellite_obj"]
-            # 获取地心坐标（GCRS惯性系），转换为ITRS地固系（ECEF）
-            geocentric = sat.at(current_t)
-            ecef_xyz_m = geocentric.frame_xyz(itrs).m  # 单位：米
-            ecef_x, ecef_y, ecef_z = ecef_xyz_m
-
-            # 计算高度（千米）
-            subpoint = wgs84.subpoint(geocentric)
-            altitude_km = subpoint.elevation.km
-
-            # 组装轨迹数据（严格遵循项目文件格式）
-            trace = {
-                "time_ms": current_time_ms,
-                "node_id": sat_info["node_id"],
-                "name": sat_info["name"],
-                "type": "SAT",
-                "ecef_x": round(ecef_x, 2),
-                "ecef_y": round(ecef_y, 2),
-                "ecef_z": round(ecef_z, 2),
-                "altitude_km": round(altitude_km, 2),
-                "orbit_id": sat_info["orbit_id"],
-                "ip": sat_info["ip"]
-            }
-            all_traces.append(trace)
-
-    print(f"📊 完成 {total_steps} 个时间步的轨迹计算，共 {len(all_traces)} 条记录")
-    return pd.DataFrame(all_traces)
+    # 一次性批量传播所有卫星：r/v形状为(n_sat, n_time, 3)，TEME系，单位km、km/s
+    r_teme, _ = propagate_teme(
+        [m["satellite_obj"].model for m in sat_metadata], *sgp4_epoch(t_grid)
+    )
+
+    # TEME → ITRF（ECEF），结果形状为(3, n_sat, n_time)，单位km
+    n_sat = len(sat_metadata)
+    r_itrf_km = teme_to_ecef(r_teme, t_grid)
+
+    # 按列预分配输出数组（行顺序：时间优先，同一时刻内按卫星顺序）
+    n_rows = total_steps * n_sat
+    ecef_x = np.empty(n_rows, dtype=np.float64)
+    ecef_y = np.empty(n_rows, dtype=np.float64)
+    ecef_z = np.empty(n_rows, dtype=np.float64)
+    for axis, col in enumerate((ecef_x, ecef_y, ecef_z)):
+        # (n_sat, n_time) → (n_time, n_sat)，同时km转换为米
+        np.multiply(r_itrf_km[axis].T, 1000.0, out=col.reshape(total_steps, n_sat))
+
+    # 计算高度（千米）：对整个ECEF数组做WGS84大地坐标转换
+    _, _, alt_m = ecef2geodetic(ecef_x, ecef_y, ecef_z)
+    altitude_km = alt_m / 1000.0
+
+    # 统一保留两位小数（原地舍入，高度需在坐标舍入前算完）
+    for col in (ecef_x, ecef_y, ecef_z, altitude_km):
+        np.round(col, 2, out=col)
+
+    # 字符串列用分类类型：每行只存卫星序号编码，各卫星的字符串只存一份
+    sat_codes = np.tile(np.arange(n_sat), total_steps)
+
+    def sat_categorical(key):
+        # 先对每颗卫星的取值去重编码（不同卫星可能同名），再按行展开
+        codes, categories = pd.factorize(pd.Series([m[key] for m in sat_metadata]))
+        return pd.Categorical.from_codes(codes[sat_codes], categories)
+
+    # 组装轨迹数据（严格遵循项目文件格式）
+    trajectory_df = pd.DataFrame({
+        "time_ms": np.repeat(step_sec * MS_PER_SEC, n_sat),
+        "node_id": sat_categorical("node_id"),
+        "name": sat_categorical("name"),
+        "type": pd.Categorical.from_codes(np.zeros(n_rows, dtype=np.int8), ["SAT"]),
+        "ecef_x": ecef_x,
+        "ecef_y": ecef_y,
+        "ecef_z": ecef_z,
+        "altitude_km": altitude_km,
+        "orbit_id": np.tile([m["orbit_id"] for m in sat_metadata], total_steps),
+        "ip": sat_categorical("ip")
+    })
+
+    print(f"📊 完成 {total_steps} 个时间步的轨迹计算，共 {n_rows} 条记录")
+    return trajectory_df
 
 def split_and_save_csv(trajectory_df):
     """
@@ -133,24 +197,23 @@ def split_and_save_csv(trajectory_df):
     # 创建输出目录（如果不存在）
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    # 计算切片数量
+    # 计算切片数量；轨迹按时间优先连续排列，每个切片对应一段连续行
     total_chunks = SIM_DURATION_SEC // CHUNK_DURATION_SEC
-
-    for chunk_idx in range(total_chunks):
-        # 切片时间范围（毫秒）
-        start_sec = chunk_idx * CHUNK_DURATION_SEC
-        end_sec = start_sec + CHUNK_DURATION_SEC
-        start_ms = start_sec * MS_PER_SEC
-        end_ms = end_sec * MS_PER_SEC - 1  # 闭区间：[startMs, endMs]
-
-        # 筛选当前切片的数据
-        chunk_df = trajectory_df[
-            (trajectory_df["time_ms"] >= start_ms) &
-            (trajectory_df["time_ms"] < end_ms + 1)
-        ]
-
-        # 文件名
-        filename = f"sat_trace_{start_ms}_{end_ms}.csv"
+    rows_per_step = len(trajectory_df) // (SIM_DURATION_SEC // TIME_STEP_SEC)
+    rows_per_chunk = rows_per_step * (CHUNK_DURATION_SEC // TIME_STEP_SEC)
+
+    # 切片时间范围（毫秒，闭区间：[startMs, endMs]）及文件名，写文件和manifest共用同一份
+    chunk_ms = CHUNK_DURATION_SEC * MS_PER_SEC
+    start_ms = np.arange(total_chunks) * chunk_ms
+    end_ms = start_ms + chunk_ms - 1
+    trace_files = [
+        f"sat_trace_{start}_{end}.csv"
+        for start, end in zip(start_ms.tolist(), end_ms.tolist())
+    ]
+
+    for chunk_idx, filename in enumerate(trace_files):
+        # 按行区间切出当前切片的数据（无需布尔掩码扫描全表）
+        chunk_df = trajectory_df.iloc[chunk_idx * rows_per_chunk:(chunk_idx + 1) * rows_per_chunk]
         file_path = os.path.join(OUTPUT_DIR, filename)
 
         # 保存CSV（不保留索引）
@@ -163,11 +226,7 @@ def split_and_save_csv(trajectory_df):
         "t0_utc": T0_UTC.strftime("%Y-%m-%d %H:%M:%S"),
         "sim_duration_sec": SIM_DURATION_SEC,
         "sat_count": MAX_SAT_COUNT,
-        "trace_files": [
-            f"sat_trace_{chunk_idx*CHUNK_DURATION_SEC*MS_PER_SEC}_"
-            f"{(chunk_idx+1)*CHUNK_DURATION_SEC*MS_PER_SEC - 1}.csv"
-            for chunk_idx in range(total_chunks)
-        ]
+        "trace_files": trace_files
     }
     manifest_path = os.path.join(
         os.path.dirname(OUTPUT_DIR), "manifest.json"
@@ -201,12 +260,16 @@ def validate_trajectory_data(df):
     # 3. 检查ECEF坐标合理性（地球半径~6371km，卫星高度~550km，总半径~6921km）
     earth_radius_km = 6371
     max_expected_radius_km = 7000  # 最大允许半径（避免卫星跑到外太空）
-    df["radius_km"] = np.sqrt(
-        (df["ecef_x"]/1000)**2 + (df["ecef_y"]/1000)**2 + (df["ecef_z"]/1000)**2
+    # 用ndarray临时量比较半径平方（单位m²），不向df追加列，也无需开方
+    radius_sq_m2 = (
+        df["ecef_x"].to_numpy()**2 + df["ecef_y"].to_numpy()**2 + df["ecef_z"].to_numpy()**2
+    )
+    abnormal_radius = (
+        (radius_sq_m2 < (earth_radius_km * 1000)**2) |
+        (radius_sq_m2 > (max_expected_radius_km * 1000)**2)
     )
-    abnormal_radius = df[df["radius_km"] > max_expected_radius_km]
-    if not abnormal_radius.empty:
-        print(f"❌ 发现 {len(abnormal_radius)} 条异常坐标（半径超过 {max_expected_radius_km}km）")
+    if abnormal_radius.any():
+        print(f"❌ 发现 {np.count_nonzero(abnormal_radius)} 条异常坐标（半径不在 {earth_radius_km}-{max_expected_radius_km}km 范围内）")
         valid = False
 
     # 4. 检查空值
@@ -232,14 +295,10 @@ if __name__ == "__main__":
 
         # 1. 初始化时间和观测点
         ts, t0 = init_time_scale()
-        observer = Topos(
-            latitude_degrees=OBS_LAT,
-            longitude_degrees=OBS_LON,
-            elevation_m=OBS_ELE
-        )
+        obs_ecef_km, obs_up = init_observer()
 
         # 2. 筛选卫星并生成元数据
-        sat_metadata = load_and_filter_satellites(t0, observer)
+        sat_metadata = load_and_filter_satellites(t0, obs_ecef_km, obs_up)
 
         # 3. 计算卫星轨迹
         trajectory_df = calculate_sat_trajectory(sat_metadata, ts, t0)
@@ -2,14 +2,31 @@ import pandas as pd
 import numpy as np
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pymap3d.ecef import ecef2geodetic
 
+# CSV解析引擎：优先使用pyarrow（多线程向量化解析），未安装时回退到pandas默认C引擎
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# IP格式校验工具：判断ip是否为"{prefix}x"（x为1-3位ASCII数字），等价于正则^prefix\d{1,3}$，
+# 用字符串向量化操作代替逐行正则匹配（isdecimal会接受全角/阿拉伯-印度数字，需同时限定ASCII）
+def ip_matches_prefix(ip, prefix):
+    ip = ip.astype("string")
+    host = ip.str.slice(len(prefix))
+    matched = (ip.str.startswith(prefix) & host.str.len().between(1, 3) &
+               host.str.isascii() & host.str.isdecimal())
+    return matched.fillna(False).astype(bool)
+
 # S1 卫星(SAT) 专属校验函数
-# 适配表头：time_ms,node_id,name,type,ecef_x,ecef_y,ecef_z,altitude_km,orbit_id,ip,radius_km
+# 适配表头：time_ms,node_id,name,type,ecef_x,ecef_y,ecef_z,altitude_km,orbit_id,ip
 # 适配规则：50个SAT为一组，同time_ms对应50行，time_ms 1000ms递增（1Hz）
 def validate_s1_csv(file_path):
     try:
-        df = pd.read_csv(file_path)
+        df = pd.read_csv(file_path, engine=CSV_ENGINE)
         row_count = len(df)
         file_name = os.path.basename(file_path)
 
@@ -17,35 +34,49 @@ def validate_s1_csv(file_path):
         if not re.match(r"^sat_trace_\d+_\d+\.csv$", file_name):
             return "FAIL", f"文件名格式错误，必须为sat_trace_{startMs}_{endMs}.csv"
         S1_REQUIRED_COLS = ["time_ms", "node_id", "name", "type", "ecef_x", 
-                            "ecef_y", "ecef_z", "altitude_km", "orbit_id", "ip", "radius_km"]
+                            "ecef_y", "ecef_z", "altitude_km", "orbit_id", "ip"]
         missing_cols = [col for col in S1_REQUIRED_COLS if col not in df.columns]
         if missing_cols:
             return "FAIL", f"表头缺失必填字段：{','.join(missing_cols)}"
 
         # 空值兜底校验：所有字段无空值
-        if df.isnull().any().any():
-            null_cols = df.columns[df.isnull().any()].tolist()
+        null_mask = df.isna().to_numpy()
+        if null_mask.any():
+            null_cols = df.columns[null_mask.any(axis=0)].tolist()
             return "FAIL", f"CSV存在空值，空值字段：{','.join(null_cols)}"
 
-        # 50行一组格式校验
-        time_group_size = df.groupby("time_ms").size()
-        abnormal_group = time_group_size[time_group_size != 50]
-        if not abnormal_group.empty:
-            return "FAIL", f"时间戳分组异常，以下time_ms行数非50行：{abnormal_group.index.tolist()}"
+        # 快速路径：合规文件按时间连续排列，time_ms可直接视为(60, 50)网格，
+        # 每行取值一致且首列按1000ms递增，即同时满足50行一组、步长和数量校验
+        time_ms = df["time_ms"].to_numpy()
+        time_grid_ok = False
+        if row_count == 60 * 50:
+            time_grid = time_ms.reshape(60, 50)
+            time_grid_ok = bool(
+                np.all(time_grid == time_grid[:, :1]) and
+                np.all(np.diff(time_grid[:, 0]) == 1000)
+            )
+
+        # 50行一组格式校验（快速路径未通过时逐组定位异常）
+        if not time_grid_ok:
+            time_group_size = df.groupby("time_ms").size()
+            abnormal_group = time_group_size[time_group_size != 50]
+            if not abnormal_group.empty:
+                return "FAIL", f"时间戳分组异常，以下time_ms行数非50行：{abnormal_group.index.tolist()}"
         duplicate_node = df[df.duplicated(subset=["time_ms", "node_id"])]
         if not duplicate_node.empty:
             return "FAIL", f"同时间戳内node_id重复：{duplicate_node[['time_ms','node_id']].head(3).values.tolist()}"
 
         # 时间戳连续性校验：1000ms步长，60秒切片60个唯一值
-        unique_time = np.sort(df["time_ms"].unique())
-        if len(unique_time) == 0:
-            return "FAIL", "无有效time_ms数据"
-        time_step = np.diff(unique_time)
-        if not np.all(time_step == 1000):
-            abnormal_steps = time_step[time_step != 1000].unique()
-            return "FAIL", f"time_ms递增异常，应1000ms步长，异常步长：{abnormal_steps}ms"
-        if len(unique_time) != 60:
-            return "FAIL", f"60秒切片唯一time_ms数量异常，应60个，实际{len(unique_time)}个"
+        if not time_grid_ok:
+            unique_time = np.unique(time_ms)
+            if len(unique_time) == 0:
+                return "FAIL", "无有效time_ms数据"
+            time_step = np.diff(unique_time)
+            if not np.all(time_step == 1000):
+                abnormal_steps = np.unique(time_step[time_step != 1000])
+                return "FAIL", f"time_ms递增异常，应1000ms步长，异常步长：{abnormal_steps}ms"
+            if len(unique_time) != 60:
+                return "FAIL", f"60秒切片唯一time_ms数量异常，应60个，实际{len(unique_time)}个"
 
         # SAT专属属性校验
         if not df["type"].eq("SAT").all():
@@ -54,13 +85,17 @@ def validate_s1_csv(file_path):
         abnormal_alt = df[(df["altitude_km"] < 200) | (df["altitude_km"] > 1200)]
         if not abnormal_alt.empty:
             return "FAIL", f"卫星高度异常（200-1200km）：{abnormal_alt[['node_id','time_ms','altitude_km']].head(3).values.tolist()}"
-        abnormal_radius = df[(df["radius_km"] < 6371) | (df["radius_km"] > 7000)]
-        if not abnormal_radius.empty:
-            return "FAIL", f"ECEF半径异常（6371-7000km）：{abnormal_radius[['node_id','time_ms','radius_km']].head(3).values.tolist()}"
+        # ECEF半径由坐标现算（radius_km不是S1输出规范字段）；比较半径平方，仅对异常行开方
+        radius_sq_m2 = df["ecef_x"].to_numpy()**2 + df["ecef_y"].to_numpy()**2 + df["ecef_z"].to_numpy()**2
+        abnormal_mask = (radius_sq_m2 < 6371e3**2) | (radius_sq_m2 > 7000e3**2)
+        if abnormal_mask.any():
+            abnormal_radius = df.loc[abnormal_mask, ["node_id", "time_ms"]].assign(
+                radius_km=np.sqrt(radius_sq_m2[abnormal_mask]) / 1000
+            )
+            return "FAIL", f"ECEF半径异常（6371-7000km）：{abnormal_radius.head(3).values.tolist()}"
 
         # IP格式合规校验
-        ip_pattern = r"^10\.0\.3\.\d{1,3}$"
-        invalid_ip = df[~df["ip"].str.match(ip_pattern, na=False)]
+        invalid_ip = df[~ip_matches_prefix(df["ip"], "10.0.3.")]
         if not invalid_ip.empty:
             return "FAIL", f"IP格式异常（必须10.0.3.x），异常IP：{invalid_ip['ip'].unique()[:3]}"
 
@@ -70,7 +105,9 @@ def validate_s1_csv(file_path):
         return "ERROR", f"文件读取/校验异常：{str(e)[:100]}"
 
 # S2 空地(GS+UAV) 专属校验函数
-def validate_s2_csv(file_path):
+# diagnostics：传入列表时，GS/UAV海拔等定位信息追加到列表而不直接打印（供批量校验在主进程按文件输出）
+def validate_s2_csv(file_path, diagnostics=None):
+    log = print if diagnostics is None else diagnostics.append
     try:
         df = pd.read_csv(file_path)
         row_count = len(df)
@@ -84,8 +121,9 @@ def validate_s2_csv(file_path):
         missing_cols = [col for col in S2_REQUIRED_COLS if col not in df.columns]
         if missing_cols:
             return "FAIL", f"表头缺失必填字段：{','.join(missing_cols)}"
-        if df.isnull().any().any():
-            null_cols = df.columns[df.isnull().any()].tolist()
+        null_mask = df.isna().to_numpy()
+        if null_mask.any():
+            null_cols = df.columns[null_mask.any(axis=0)].tolist()
             return "FAIL", f"CSV存在空值，空值字段：{','.join(null_cols)}"
 
         # 4行一组格式校验：1GS+3UAV，同time_ms对应4行
@@ -114,14 +152,17 @@ def validate_s2_csv(file_path):
             df["lat"] = lat
             df["lon"] = lon
             df["alt_m"] = alt
-            df["ecef_mag_km"] = np.sqrt(df["ecef_x"]**2 + df["ecef_y"]**2 + df["ecef_z"]**2) / 1000
+            ecef_mag_sq_m2 = df["ecef_x"].to_numpy()**2 + df["ecef_y"].to_numpy()**2 + df["ecef_z"].to_numpy()**2
 
-            # ECEF模长合理性校验
+            # ECEF模长合理性校验：比较模长平方，仅对异常行开方
             ecef_min = 6371
             ecef_max = 7000
-            abnormal_ecef = df[(df["ecef_mag_km"] < ecef_min) | (df["ecef_mag_km"] > ecef_max)]
-            if not abnormal_ecef.empty:
-                err_data = abnormal_ecef[['node_id','time_ms','ecef_mag_km']].head(3).values.tolist()
+            abnormal_mask = (ecef_mag_sq_m2 < (ecef_min * 1000)**2) | (ecef_mag_sq_m2 > (ecef_max * 1000)**2)
+            if abnormal_mask.any():
+                abnormal_ecef = df.loc[abnormal_mask, ["node_id", "time_ms"]].assign(
+                    ecef_mag_km=np.sqrt(ecef_mag_sq_m2[abnormal_mask]) / 1000
+                )
+                err_data = abnormal_ecef.head(3).values.tolist()
                 return "FAIL", f"ECEF模长异常（需{ecef_min}-{ecef_max}km）：{err_data}"
 
             # 经纬度合理性校验
@@ -137,9 +178,9 @@ def validate_s2_csv(file_path):
             uav_mask = df["type"] == "UAV"
             gs_mask = df["type"] == "GS"
             if not df[gs_mask].empty:
-                print(f"【GS真实海拔】：{df[gs_mask]['alt_m'].unique()} 米")
+                log(f"【GS真实海拔】：{df[gs_mask]['alt_m'].unique()} 米")
             if not df[uav_mask].empty:
-                print(f"【UAV真实海拔】：{df[uav_mask]['alt_m'].unique()[:3]} 米")
+                log(f"【UAV真实海拔】：{df[uav_mask]['alt_m'].unique()[:3]} 米")
             
             # 高度合理性校验（按类型差异化）
             uav_alt_min, uav_alt_max = 500.0, 5000.0
@@ -181,32 +222,39 @@ def validate_s2_csv(file_path):
         # 电池校验：UAV变化率≤10%/秒，GS=-1
         if not df[gs_mask]["battery_pct"].eq(-1).all():
             return "FAIL", f"GS的battery_pct必须全为-1，发现异常值"
-        uav_df = df[uav_mask].copy()
-        for uid in uav_df["node_id"].unique():
-            single_uav = uav_df[uav_df["node_id"] == uid].sort_values("time_ms")
-            battery_diff = np.diff(single_uav["battery_pct"])
-            time_diff = np.diff(single_uav["time_ms"]) / 1000
-            valid_idx = time_diff != 0
-            if valid_idx.any():
-                change_rate = battery_diff[valid_idx] / time_diff[valid_idx]
-                if (np.abs(change_rate) > 10).any():
-                    abnormal_rate = change_rate[np.abs(change_rate) > 10].round(2)
-                    return "FAIL", f"UAV {uid} 电池突变（变化率>10%/秒），异常变化率：{abnormal_rate[:5]}"
+        # 所有UAV一次性按(node_id出现顺序, time_ms)排序，相邻行差分；跨UAV边界的差分需屏蔽
+        uav_df = df[uav_mask]
+        uav_codes, uav_ids = pd.factorize(uav_df["node_id"])
+        order = np.lexsort((uav_df["time_ms"].to_numpy(), uav_codes))
+        uav_codes = uav_codes[order]
+        same_uav = uav_codes[1:] == uav_codes[:-1]
+        seg_codes = uav_codes[1:]
+
+        battery_diff = np.diff(uav_df["battery_pct"].to_numpy()[order])
+        time_diff = np.diff(uav_df["time_ms"].to_numpy()[order]) / 1000
+        valid_idx = same_uav & (time_diff != 0)
+        change_rate = np.zeros_like(battery_diff, dtype=float)
+        change_rate[valid_idx] = battery_diff[valid_idx] / time_diff[valid_idx]
+        abnormal_battery = valid_idx & (np.abs(change_rate) > 10)
+        if abnormal_battery.any():
+            bad_code = seg_codes[abnormal_battery].min()
+            abnormal_rate = change_rate[abnormal_battery & (seg_codes == bad_code)].round(2)
+            return "FAIL", f"UAV {uav_ids[bad_code]} 电池突变（变化率>10%/秒），异常变化率：{abnormal_rate[:5]}"
         
         # 角色校验：UAV移动（>5米）时必须为RELAY
         MOVE_THRESHOLD = 5
-        for uid in uav_df["node_id"].unique():
-            single_uav = df[df["node_id"] == uid].sort_values("time_ms")
-            pos_diff = np.sqrt(np.diff(single_uav["ecef_x"])**2 + np.diff(single_uav["ecef_y"])**2 + np.diff(single_uav["ecef_z"])**2)
-            moving = pos_diff > MOVE_THRESHOLD
-            roles = single_uav["role"].values[1:]
-            invalid_role = roles[moving & (roles != "RELAY")]
-            if len(invalid_role) > 0:
-                return "FAIL", f"UAV {uid} 移动时角色不为RELAY"
+        # 位移平方与阈值平方比较（免开方），一次差分得到(n-1, 3)位移矩阵
+        pos = uav_df[["ecef_x", "ecef_y", "ecef_z"]].to_numpy(dtype=float)[order]
+        pos_step = np.diff(pos, axis=0)
+        move_sq = np.einsum("ij,ij->i", pos_step, pos_step)
+        moving = same_uav & (move_sq > MOVE_THRESHOLD**2)
+        not_relay = ~uav_df["role"].eq("RELAY").to_numpy(dtype=bool)[order][1:]
+        invalid_role = moving & not_relay
+        if invalid_role.any():
+            return "FAIL", f"UAV {uav_ids[seg_codes[invalid_role].min()]} 移动时角色不为RELAY"
 
         # IP格式校验
-        ip_pattern = r"^10\.0\.0\.\d{1,3}$"
-        invalid_ip = df[~df["ip"].str.match(ip_pattern, na=False)]
+        invalid_ip = df[~ip_matches_prefix(df["ip"], "10.0.0.")]
         if not invalid_ip.empty:
             return "FAIL", f"IP格式异常（必须10.0.0.x），异常IP：{invalid_ip['ip'].unique()[:3]}"
 
@@ -215,7 +263,18 @@ def validate_s2_csv(file_path):
     except Exception as e:
         return "ERROR", f"文件读取/校验异常：{str(e)[:100]}"
 
-# 批量校验主函数：自动区分S1/S2文件类型
+# 单文件校验分发：按文件名前缀区分S1/S2，返回(类型标签, 状态, 信息, 定位信息列表)
+# 在工作进程中执行，不直接打印，定位信息随结果返回由主进程输出
+def validate_csv(file_path):
+    file = os.path.basename(file_path)
+    diagnostics = []
+    if file.startswith("sat_trace_"):
+        return ("S1-SAT",) + validate_s1_csv(file_path) + (diagnostics,)
+    elif file.startswith("uav_trace_"):
+        return ("S2-GS+UAV",) + validate_s2_csv(file_path, diagnostics) + (diagnostics,)
+    return ("未知类型", "跳过", "文件名需以sat_trace_/uav_trace_开头", diagnostics)
+
+# 批量校验主函数：自动区分S1/S2文件类型，各文件相互独立，多进程并行校验
 def batch_validate (csv_dir="../data/scenarios/rescue_mission_2026_v1/traces"):
     if not os.path.exists(csv_dir):
         print(f"❌ 错误：未找到数据文件夹 {csv_dir}")
@@ -224,16 +283,13 @@ def batch_validate (csv_dir="../data/scenarios/rescue_mission_2026_v1/traces"):
     if not csv_files:
         print(f"⚠️  提示：{csv_dir} 文件夹下无CSV文件")
         return
-    for file in csv_files:
-        file_path = os.path.join(csv_dir, file)
-        if file.startswith("sat_trace_"):
-            status, msg = validate_s1_csv(file_path)
-            print(f"【S1-SAT | {file}】→ {status}：{msg}")
-        elif file.startswith("uav_trace_"):
-            status, msg = validate_s2_csv(file_path)
-            print(f"【S2-GS+UAV | {file}】→ {status}：{msg}")
-        else:
-            print(f"【未知类型 | {file}】→ 跳过：文件名需以sat_trace_/uav_trace_开头")
+    file_paths = [os.path.join(csv_dir, file) for file in csv_files]
+    with ProcessPoolExecutor() as pool:
+        results = list(pool.map(validate_csv, file_paths))
+    for file, (label, status, msg, diagnostics) in zip(csv_files, results):
+        for line in diagnostics:
+            print(line)
+        print(f"【{label} | {file}】→ {status}：{msg}")
 
 # 程序运行入口
 if __name__ == "__main__":